@@ -1,5 +1,8 @@
 """Script to get summary statistics from the data."""
 import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
 from databricks.sdk import WorkspaceClient
 
 os.environ["DATABRICKS_CONFIG_PROFILE"] = "one-env-temp"
@@ -8,6 +11,7 @@ w = WorkspaceClient()
 CATALOG = "serverless_dbdkzc_catalog"
 SCHEMA = "default"
 
+@lru_cache(maxsize=None)
 def get_warehouse_id() -> str:
     warehouses = list(w.warehouses.list())
     for wh in warehouses:
@@ -15,9 +19,9 @@ def get_warehouse_id() -> str:
             return wh.id
     return warehouses[0].id
 
-def run_query(sql: str):
+def run_query(sql: str, warehouse_id: str):
     result = w.statement_execution.execute_statement(
-        warehouse_id=get_warehouse_id(),
+        warehouse_id=warehouse_id,
         statement=sql,
         wait_timeout="50s"
     )
@@ -25,28 +29,110 @@ def run_query(sql: str):
         return result.result.data_array
     return []
 
-queries = {
-    "Total Cities": f"SELECT COUNT(DISTINCT city) FROM {CATALOG}.{SCHEMA}.gold_city_investment",
-    "Total Properties": f"SELECT COUNT(*) FROM {CATALOG}.{SCHEMA}.gold_property_performance",
-    "Total Bookings": f"SELECT COUNT(*) FROM {CATALOG}.{SCHEMA}.silver_bookings_enriched",
-    "Total Clickstream Events": f"SELECT COUNT(*) FROM {CATALOG}.{SCHEMA}.silver_clickstream",
-    "Date Range (Clickstream)": f"SELECT MIN(event_date), MAX(event_date) FROM {CATALOG}.{SCHEMA}.silver_clickstream",
-    "Cities List": f"SELECT DISTINCT city FROM {CATALOG}.{SCHEMA}.gold_city_investment ORDER BY city",
-    "Property Types": f"SELECT DISTINCT property_type, COUNT(*) as cnt FROM {CATALOG}.{SCHEMA}.gold_property_performance GROUP BY property_type ORDER BY cnt DESC",
-    "Quadrant Distribution": f"SELECT quadrant, COUNT(*) as cnt FROM {CATALOG}.{SCHEMA}.gold_city_investment GROUP BY quadrant ORDER BY cnt DESC",
-    "Performance Categories": f"SELECT performance_category, COUNT(*) as cnt FROM {CATALOG}.{SCHEMA}.gold_property_performance GROUP BY performance_category ORDER BY cnt DESC",
-    "Device Distribution": f"SELECT device, COUNT(*) as events FROM {CATALOG}.{SCHEMA}.silver_clickstream GROUP BY device ORDER BY events DESC",
-    "Amenity Categories": f"SELECT DISTINCT amenity_category FROM {CATALOG}.{SCHEMA}.gold_amenity_lift",
-    "Top 10 Cities by Revenue": f"SELECT city, estimated_revenue FROM {CATALOG}.{SCHEMA}.gold_city_investment ORDER BY estimated_revenue DESC LIMIT 10",
+def table(name: str) -> str:
+    return f"{CATALOG}.{SCHEMA}.{name}"
+
+WAREHOUSE_ID = get_warehouse_id()
+
+# Summary sections in print order, with the number of value columns each one prints
+SECTIONS = {
+    "Total Cities": 1,
+    "Total Properties": 1,
+    "Total Bookings": 1,
+    "Total Clickstream Events": 1,
+    "Date Range (Clickstream)": 2,
+    "Cities List": 1,
+    "Property Types": 2,
+    "Quadrant Distribution": 2,
+    "Performance Categories": 2,
+    "Device Distribution": 2,
+    "Amenity Categories": 1,
+    "Top 10 Cities by Revenue": 2,
+}
+
+# One statement per source table. Every statement returns rows shaped as
+# (section, position, value_1, value_2) so results can be split back per section.
+BATCHES = {
+    "gold_city_investment": f"""
+        SELECT 'Total Cities' AS section, 0 AS pos,
+               CAST(COUNT(DISTINCT city) AS STRING) AS v1, NULL AS v2
+        FROM {table('gold_city_investment')}
+        UNION ALL
+        SELECT 'Cities List', ROW_NUMBER() OVER (ORDER BY city), city, NULL
+        FROM {table('gold_city_investment')} GROUP BY city
+        UNION ALL
+        SELECT 'Quadrant Distribution', ROW_NUMBER() OVER (ORDER BY COUNT(*) DESC),
+               quadrant, CAST(COUNT(*) AS STRING)
+        FROM {table('gold_city_investment')} GROUP BY quadrant
+        UNION ALL
+        SELECT * FROM (
+            SELECT 'Top 10 Cities by Revenue',
+                   ROW_NUMBER() OVER (ORDER BY estimated_revenue DESC) AS pos,
+                   city, CAST(estimated_revenue AS STRING)
+            FROM {table('gold_city_investment')}
+        ) WHERE pos <= 10
+        ORDER BY section, pos
+    """,
+    "gold_property_performance": f"""
+        SELECT 'Total Properties' AS section, 0 AS pos, CAST(COUNT(*) AS STRING) AS v1, NULL AS v2
+        FROM {table('gold_property_performance')}
+        UNION ALL
+        SELECT 'Property Types', ROW_NUMBER() OVER (ORDER BY COUNT(*) DESC),
+               property_type, CAST(COUNT(*) AS STRING)
+        FROM {table('gold_property_performance')} GROUP BY property_type
+        UNION ALL
+        SELECT 'Performance Categories', ROW_NUMBER() OVER (ORDER BY COUNT(*) DESC),
+               performance_category, CAST(COUNT(*) AS STRING)
+        FROM {table('gold_property_performance')} GROUP BY performance_category
+        ORDER BY section, pos
+    """,
+    "silver_bookings_enriched": f"""
+        SELECT 'Total Bookings' AS section, 0 AS pos, CAST(COUNT(*) AS STRING) AS v1, NULL AS v2
+        FROM {table('silver_bookings_enriched')}
+    """,
+    # GROUPING SETS computes the per-device and overall aggregates in a single pass
+    "silver_clickstream": f"""
+        WITH agg AS (
+            SELECT device, GROUPING(device) AS is_total, COUNT(*) AS events,
+                   MIN(event_date) AS first_date, MAX(event_date) AS last_date
+            FROM {table('silver_clickstream')}
+            GROUP BY GROUPING SETS ((device), ())
+        )
+        SELECT 'Total Clickstream Events' AS section, 0 AS pos,
+               CAST(events AS STRING) AS v1, NULL AS v2
+        FROM agg WHERE is_total = 1
+        UNION ALL
+        SELECT 'Date Range (Clickstream)', 0, CAST(first_date AS STRING), CAST(last_date AS STRING)
+        FROM agg WHERE is_total = 1
+        UNION ALL
+        SELECT 'Device Distribution', ROW_NUMBER() OVER (ORDER BY events DESC),
+               device, CAST(events AS STRING)
+        FROM agg WHERE is_total = 0
+        ORDER BY section, pos
+    """,
+    "gold_amenity_lift": f"""
+        SELECT DISTINCT 'Amenity Categories' AS section, 0 AS pos,
+                        amenity_category AS v1, NULL AS v2
+        FROM {table('gold_amenity_lift')}
+    """,
 }
 
 print("=" * 70)
 print("DATA SUMMARY - serverless_dbdkzc_catalog.default")
 print("=" * 70)
 
-for name, sql in queries.items():
+# Batches are independent, so run them concurrently (capped to stay within
+# the warehouse's concurrent statement slots)
+with ThreadPoolExecutor(max_workers=6) as executor:
+    futures = [executor.submit(run_query, sql, WAREHOUSE_ID) for sql in BATCHES.values()]
+
+results: dict[str, list] = {name: [] for name in SECTIONS}
+for future in futures:
+    for section, _pos, *values in future.result():
+        results[section].append(values[:SECTIONS[section]])
+
+for name, rows in results.items():
     print(f"\n{name}:")
     print("-" * 40)
-    rows = run_query(sql)
     for row in rows:
         print("  ", row)
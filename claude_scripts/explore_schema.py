@@ -1,5 +1,8 @@
 """Script to explore data in serverless_dbdkzc_catalog.default schema."""
 import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
 from databricks.sdk import WorkspaceClient
 
 # Initialize client using the profile
@@ -9,13 +12,16 @@ w = WorkspaceClient()
 CATALOG = "serverless_dbdkzc_catalog"
 SCHEMA = "default"
 
-def query_table(table_name: str, limit: int = 10) -> None:
-    """Query a table and print results."""
-    print(f"\n{'='*60}")
-    print(f"TABLE: {table_name}")
-    print('='*60)
+def query_table(table_name: str, limit: int = 10) -> list[str]:
+    """Query a table and return the lines to print.
+
+    Output is collected rather than printed so tables can be queried
+    concurrently and still be printed in order.
+    """
+    lines = [f"\n{'='*60}", f"TABLE: {table_name}", '='*60]
 
-    sql = f"SELECT * FROM {CATALOG}.{SCHEMA}.{table_name} LIMIT {limit}"
+    # TABLESAMPLE reads only enough files to return the preview rows
+    sql = f"SELECT * FROM {CATALOG}.{SCHEMA}.{table_name} TABLESAMPLE ({limit} ROWS)"
 
     try:
         result = w.statement_execution.execute_statement(
@@ -26,18 +32,20 @@ def query_table(table_name: str, limit: int = 10) -> None:
 
         if result.manifest and result.manifest.schema:
             columns = [col.name for col in result.manifest.schema.columns]
-            print(f"Columns: {columns}")
-            print("-" * 60)
+            lines.append(f"Columns: {columns}")
+            lines.append("-" * 60)
 
         if result.result and result.result.data_array:
-            for row in result.result.data_array:
-                print(row)
+            lines.extend(str(row) for row in result.result.data_array)
         else:
-            print("No data returned")
+            lines.append("No data returned")
 
     except Exception as e:
-        print(f"Error querying {table_name}: {e}")
+        lines.append(f"Error querying {table_name}: {e}")
 
+    return lines
+
+@lru_cache(maxsize=None)
 def get_warehouse_id() -> str:
     """Get the first available SQL warehouse ID."""
     warehouses = list(w.warehouses.list())
@@ -70,8 +78,14 @@ def main():
     print("Exploring serverless_dbdkzc_catalog.default schema")
     print("=" * 60)
 
-    for table in tables:
-        query_table(table)
+    # Resolve the warehouse up front so worker threads share the cached id
+    get_warehouse_id()
+
+    # Tables are independent, so query them concurrently (capped to stay
+    # within the warehouse's concurrent statement slots)
+    with ThreadPoolExecutor(max_workers=6) as executor:
+        for lines in executor.map(query_table, tables):
+            print("\n".join(lines))
 
 if __name__ == "__main__":
     main()
@@ -83,12 +83,15 @@ with conn.cursor() as cur:
     for row in rows:
         print(f"   {row[0]}: {row[1]:,} viewers, {row[2]:.1f}% conv, {row[3]}")
 
-    # Test: Count rows in each table
+    # Test: Count rows in each table (one round-trip for all tables)
     print(f"\n7. Row counts:")
-    for table in tables:
-        cur.execute(f"SELECT COUNT(*) FROM {SCHEMA}.{table}")
-        count = cur.fetchone()[0]
-        print(f"   {table}: {count:,} rows")
+    if tables:
+        cur.execute(" UNION ALL ".join(
+            f"SELECT '{table}' AS table_name, COUNT(*) AS n FROM {SCHEMA}.{table}"
+            for table in tables
+        ))
+        for table, count in cur.fetchall():
+            print(f"   {table}: {count:,} rows")
 
 conn.close()
 print("\n" + "=" * 60)
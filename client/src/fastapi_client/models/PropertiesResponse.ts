@@ -10,6 +10,7 @@ import type { Property } from './Property';
 export type PropertiesResponse = {
     city: string;
     properties: Array<Property>;
+    total_count: number;
     city_averages: Record<string, CityAverages>;
 };
 
@@ -8,5 +8,6 @@ import type { TopAmenityCity } from './TopAmenityCity';
  */
 export type TopAmenitiesResponse = {
     data: Array<TopAmenityCity>;
+    total_count: number;
 };
 
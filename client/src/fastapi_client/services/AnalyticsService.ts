@@ -65,18 +65,27 @@ export class AnalyticsService {
     /**
      * Get Properties
      * Get property performance data with city averages and bucket categorization.
+     *
+     * Send `Accept: application/x-ndjson` to stream the properties as NDJSON
+     * rows instead (without city averages).
      * @param city Filter by city (or 'all')
+     * @param limit Page size (default: all properties)
+     * @param offset Number of properties to skip
      * @returns PropertiesResponse Successful Response
      * @throws ApiError
      */
     public static getPropertiesApiAnalyticsPropertiesGet(
         city?: (string | null),
+        limit?: (number | null),
+        offset: number = 0,
     ): CancelablePromise<PropertiesResponse> {
         return __request(OpenAPI, {
             method: 'GET',
             url: '/api/analytics/properties',
             query: {
                 'city': city,
+                'limit': limit,
+                'offset': offset,
             },
             errors: {
                 422: `Validation Error`,
@@ -110,13 +119,27 @@ export class AnalyticsService {
     /**
      * Get Top Amenities By City
      * Get top 3 amenities for each city.
+     *
+     * Send `Accept: application/x-ndjson` to stream the rows as NDJSON instead.
+     * @param limit Page size (default: all rows)
+     * @param offset Number of rows to skip
      * @returns TopAmenitiesResponse Successful Response
      * @throws ApiError
      */
-    public static getTopAmenitiesByCityApiAnalyticsAmenitiesTopByCityGet(): CancelablePromise<TopAmenitiesResponse> {
+    public static getTopAmenitiesByCityApiAnalyticsAmenitiesTopByCityGet(
+        limit?: (number | null),
+        offset: number = 0,
+    ): CancelablePromise<TopAmenitiesResponse> {
         return __request(OpenAPI, {
             method: 'GET',
             url: '/api/analytics/amenities/top-by-city',
+            query: {
+                'limit': limit,
+                'offset': offset,
+            },
+            errors: {
+                422: `Validation Error`,
+            },
         });
     }
     /**
@@ -1,24 +1,41 @@
 """FastAPI application for Databricks App Template."""
 
-import os
+import logging
 from contextlib import asynccontextmanager
+from pathlib import Path
 
 from fastapi import FastAPI
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 from fastapi.staticfiles import StaticFiles
 
 from server.config import get_settings
+from server.dependencies import get_lakebase_service
+from server.middleware import ETagMiddleware
 from server.routers import router
 from server.exceptions import AppException, app_exception_handler
 
 
+logger = logging.getLogger(__name__)
+
 # Load settings once at module level
 settings = get_settings()
 
+# Resolved against this file rather than the working directory
+CLIENT_BUILD_DIR = Path(__file__).resolve().parent.parent / 'client' / 'build'
+
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Manage application lifespan."""
+    # Open the Lakebase pool before serving traffic. Response model validators
+    # are already built at import time, so the pool is the only cold-start cost
+    # left on the first request. Failure is not fatal: the pool is retried lazily.
+    try:
+        await run_in_threadpool(get_lakebase_service().warm_up)
+    except Exception as e:
+        logger.warning('Lakebase warm-up failed, deferring to first request: %s', e)
     yield
 
 
@@ -27,8 +44,12 @@ app = FastAPI(
     description=settings.api_description,
     version=settings.api_version,
     lifespan=lifespan,
+    default_response_class=ORJSONResponse,
 )
 
+# Conditional GET for analytics polls: unchanged payloads are answered with 304
+app.add_middleware(ETagMiddleware, path_prefix='/api/analytics', max_age=60)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=settings.cors_origins_list,
@@ -55,5 +76,5 @@ async def health():
 # This static file mount MUST be the last route registered!
 # It catches all unmatched requests and serves the React app.
 # Any routes added after this will be unreachable!
-if os.path.exists('client/build'):
-  app.mount('/', StaticFiles(directory='client/build', html=True), name='static')
+if CLIENT_BUILD_DIR.is_dir():
+  app.mount('/', StaticFiles(directory=CLIENT_BUILD_DIR, html=True), name='static')
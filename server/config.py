@@ -4,7 +4,7 @@ Centralizes all configuration with validation and type safety.
 Automatically loads from environment variables and .env files.
 """
 
-from functools import lru_cache
+from functools import cached_property, lru_cache
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
@@ -14,10 +14,24 @@ class Settings(BaseSettings):
     # Lakebase Configuration
     lakebase_instance_name: str = "marketplace-intel-db"
     lakebase_schema: str = "gold"
+    # Connect through an external pooler (e.g. pgbouncer) instead of the
+    # instance's read/write DNS. Leave unset to connect to Lakebase directly.
+    lakebase_host: str | None = None
+    lakebase_port: int = 5432
+    # Server-side prepared statements; disable behind a transaction-mode pooler
+    prepare_statements: bool = True
 
-    # Connection Pool Settings
+    # Connection Pool Settings. Leave pool_max_connections unset to size the
+    # pool from the CPU count; pool_min_connections is a floor for idle connections.
     pool_min_connections: int = 2
-    pool_max_connections: int = 10
+    pool_max_connections: int | None = None
+    # Seconds to wait for a free pooled connection before failing the request
+    pool_timeout: float = 30.0
+
+    # Analytics cache TTLs in seconds. Gold tables change at most once per
+    # ingestion batch, and lookup lists (cities, property types) even less often.
+    analytics_cache_ttl: int = 300
+    lookup_cache_ttl: int = 600
 
     # Token refresh interval in seconds (15 min default, tokens expire in ~1 hour)
     token_refresh_interval: int = 900
@@ -37,9 +51,9 @@ class Settings(BaseSettings):
         extra="ignore",  # Ignore extra env vars
     )
 
-    @property
+    @cached_property
     def cors_origins_list(self) -> list[str]:
-        """Parse comma-separated CORS origins into a list."""
+        """Parse comma-separated CORS origins into a list, once per instance."""
         return [origin.strip() for origin in self.cors_origins.split(",")]
 
 
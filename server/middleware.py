@@ -0,0 +1,93 @@
+"""ASGI middleware for HTTP-level response caching."""
+
+import hashlib
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+
+class ETagMiddleware:
+    """Add ETag validators to JSON GET responses and answer revalidations with 304.
+
+    Repeat dashboard polls with a matching If-None-Match header get an empty
+    304 Not Modified instead of the full body. Streamed (non-JSON) and
+    non-200 responses pass through without an ETag. Every response under the
+    prefix gets Vary: Accept, since some routes return JSON or NDJSON for the
+    same URL depending on the Accept header.
+    """
+
+    def __init__(self, app: ASGIApp, path_prefix: str = "/api/analytics", max_age: int = 60):
+        self.app = app
+        self.path_prefix = path_prefix
+        self.cache_control = f"max-age={max_age}, must-revalidate"
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        """Buffer and tag JSON GET responses under the prefix; pass others through."""
+        if (
+            scope["type"] != "http"
+            or scope["method"] != "GET"
+            or not scope["path"].startswith(self.path_prefix)
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        if_none_match = Headers(scope=scope).get("if-none-match")
+        start: Message | None = None
+        body: list[bytes] = []
+        passthrough = False
+
+        async def send_with_etag(message: Message) -> None:
+            nonlocal start, passthrough
+
+            if message["type"] == "http.response.start":
+                _vary_on_accept(message)
+                content_type = Headers(raw=message["headers"]).get("content-type", "")
+                if message["status"] != 200 or not content_type.startswith("application/json"):
+                    passthrough = True
+                    await send(message)
+                else:
+                    start = message
+                return
+
+            if passthrough or message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            # Buffer the JSON body until complete so it can be hashed
+            body.append(message.get("body", b""))
+            if message.get("more_body", False):
+                return
+
+            content = b"".join(body)
+            etag = f'"{hashlib.blake2b(content, digest_size=8).hexdigest()}"'
+            headers = MutableHeaders(scope=start)
+            headers["etag"] = etag
+            headers["cache-control"] = self.cache_control
+
+            if if_none_match and _etag_matches(if_none_match, etag):
+                del headers["content-length"]
+                del headers["content-type"]
+                await send({**start, "status": 304})
+                await send({"type": "http.response.body", "body": b""})
+                return
+
+            await send(start)
+            await send({"type": "http.response.body", "body": content})
+
+        await self.app(scope, receive, send_with_etag)
+
+
+def _vary_on_accept(message: Message) -> None:
+    """Add Accept to the Vary header of a response start message, once."""
+    headers = MutableHeaders(scope=message)
+    vary = headers.get("vary", "")
+    if "accept" not in (field.strip().lower() for field in vary.split(",")):
+        headers.add_vary_header("Accept")
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    """Check an If-None-Match header value against an ETag (weak comparison)."""
+    if if_none_match.strip() == "*":
+        return True
+    candidates = (tag.strip().removeprefix("W/") for tag in if_none_match.split(","))
+    return etag in candidates
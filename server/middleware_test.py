@@ -0,0 +1,178 @@
+"""Tests for the ETag middleware."""
+
+import pytest
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from starlette.routing import Route
+from starlette.testclient import TestClient
+
+from server.middleware import ETagMiddleware, _etag_matches
+
+
+async def city(request):
+    return JSONResponse({"city": "Lisbon", "views": 42})
+
+
+async def missing(request):
+    return JSONResponse({"detail": "not found"}, status_code=404)
+
+
+async def stream(request):
+    async def rows():
+        yield b'{"id": 1}\n'
+        yield b'{"id": 2}\n'
+
+    return StreamingResponse(rows(), media_type="application/x-ndjson")
+
+
+async def chunked(request):
+    async def parts():
+        yield b'{"a": '
+        yield b"1}"
+
+    return StreamingResponse(parts(), media_type="application/json")
+
+
+async def negotiated(request):
+    return StreamingResponse(
+        iter([b'{"id": 1}\n']), media_type="application/x-ndjson", headers={"Vary": "Accept"}
+    )
+
+
+async def health(request):
+    return JSONResponse({"status": "ok"})
+
+
+async def echo(request):
+    return PlainTextResponse("posted")
+
+
+@pytest.fixture
+def client():
+    app = Starlette(
+        routes=[
+            Route("/api/analytics/city", city),
+            Route("/api/analytics/missing", missing),
+            Route("/api/analytics/stream", stream),
+            Route("/api/analytics/chunked", chunked),
+            Route("/api/analytics/negotiated", negotiated),
+            Route("/api/analytics/echo", echo, methods=["POST"]),
+            Route("/api/health", health),
+        ]
+    )
+    app.add_middleware(ETagMiddleware, path_prefix="/api/analytics", max_age=60)
+    return TestClient(app)
+
+
+def test_json_response_gets_etag_and_cache_control(client):
+    response = client.get("/api/analytics/city")
+
+    assert response.status_code == 200
+    assert response.json() == {"city": "Lisbon", "views": 42}
+    assert response.headers["etag"].startswith('"')
+    assert response.headers["cache-control"] == "max-age=60, must-revalidate"
+
+
+def test_etag_is_stable_for_the_same_body(client):
+    first = client.get("/api/analytics/city").headers["etag"]
+
+    assert client.get("/api/analytics/city").headers["etag"] == first
+
+
+def test_matching_if_none_match_returns_empty_304(client):
+    etag = client.get("/api/analytics/city").headers["etag"]
+
+    response = client.get("/api/analytics/city", headers={"If-None-Match": etag})
+
+    assert response.status_code == 304
+    assert response.content == b""
+    assert response.headers["etag"] == etag
+    assert "content-type" not in response.headers
+    assert "content-length" not in response.headers
+
+
+def test_weak_etag_in_list_matches(client):
+    etag = client.get("/api/analytics/city").headers["etag"]
+
+    response = client.get(
+        "/api/analytics/city", headers={"If-None-Match": f'"stale", W/{etag}'}
+    )
+
+    assert response.status_code == 304
+
+
+def test_stale_etag_returns_full_body(client):
+    response = client.get("/api/analytics/city", headers={"If-None-Match": '"stale"'})
+
+    assert response.status_code == 200
+    assert response.json() == {"city": "Lisbon", "views": 42}
+
+
+def test_body_sent_in_several_chunks_is_hashed_whole(client):
+    response = client.get("/api/analytics/chunked")
+
+    assert response.json() == {"a": 1}
+    assert "etag" in response.headers
+
+
+def test_responses_under_prefix_vary_on_accept(client):
+    etag = client.get("/api/analytics/city").headers["etag"]
+
+    assert client.get("/api/analytics/city").headers["vary"] == "Accept"
+    assert client.get(
+        "/api/analytics/city", headers={"If-None-Match": etag}
+    ).headers["vary"] == "Accept"
+    assert client.get("/api/analytics/stream").headers["vary"] == "Accept"
+    assert client.get("/api/analytics/missing").headers["vary"] == "Accept"
+
+
+def test_existing_vary_accept_is_not_repeated(client):
+    assert client.get("/api/analytics/negotiated").headers["vary"] == "Accept"
+
+
+def test_non_200_response_passes_through(client):
+    response = client.get("/api/analytics/missing", headers={"If-None-Match": "*"})
+
+    assert response.status_code == 404
+    assert response.json() == {"detail": "not found"}
+    assert "etag" not in response.headers
+
+
+def test_streamed_ndjson_passes_through(client):
+    response = client.get("/api/analytics/stream", headers={"If-None-Match": "*"})
+
+    assert response.status_code == 200
+    assert response.content == b'{"id": 1}\n{"id": 2}\n'
+    assert "etag" not in response.headers
+
+
+def test_paths_outside_prefix_are_untouched(client):
+    response = client.get("/api/health")
+
+    assert response.status_code == 200
+    assert "etag" not in response.headers
+    assert "vary" not in response.headers
+
+
+def test_non_get_requests_are_untouched(client):
+    response = client.post("/api/analytics/echo", headers={"If-None-Match": "*"})
+
+    assert response.status_code == 200
+    assert response.text == "posted"
+    assert "etag" not in response.headers
+
+
+@pytest.mark.parametrize(
+    ("if_none_match", "expected"),
+    [
+        ('"abc"', True),
+        ('W/"abc"', True),
+        (' "x" , "abc" ', True),
+        ("*", True),
+        ('"abcd"', False),
+        ("abc", False),
+        ("", False),
+    ],
+)
+def test_etag_matches(if_none_match, expected):
+    assert _etag_matches(if_none_match, '"abc"') is expected
@@ -5,7 +5,9 @@ from fastapi import APIRouter
 
 from .user import router as user_router
 from .analytics import router as analytics_router
+from .admin import router as admin_router
 
 router = APIRouter()
 router.include_router(user_router, prefix='/user', tags=['user'])
 router.include_router(analytics_router, prefix='/analytics', tags=['analytics'])
+router.include_router(admin_router, prefix='/admin', tags=['admin'])
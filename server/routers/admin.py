@@ -0,0 +1,21 @@
+"""Admin router for operational endpoints."""
+
+from fastapi import APIRouter
+
+from server.routers.analytics import clear_caches
+from server.services.lakebase_service import pool_stats
+
+router = APIRouter()
+
+
+@router.post("/cache/invalidate")
+async def invalidate_cache():
+    """Flush cached analytics query results, e.g. after a new ingestion batch."""
+    clear_caches()
+    return {"status": "cleared"}
+
+
+@router.get("/metrics")
+async def metrics():
+    """Report connection pool size gauges and recent checkout wait times."""
+    return {"pool": pool_stats()}
@@ -1,14 +1,29 @@
 """Analytics router for marketplace intelligence data."""
 
-from fastapi import APIRouter, Depends, Query
+from itertools import chain
+from typing import Any, Callable, Iterator
+
+import orjson
+from cachetools import TTLCache
+from fastapi import APIRouter, Depends, Query, Request
 from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from pydantic import BaseModel
 
+from server.config import get_settings
 from server.dependencies import get_lakebase_service
-from server.services.lakebase_service import LakebaseService
+from server.services.lakebase_service import LakebaseService, clear_query_caches
 
 
 router = APIRouter()
+settings = get_settings()
+
+# Query result caches keyed by (service method, *args). Handlers run on the
+# event loop thread, so the caches are never accessed concurrently.
+_analytics_cache: TTLCache = TTLCache(maxsize=256, ttl=settings.analytics_cache_ttl)
+_lookup_cache: TTLCache = TTLCache(maxsize=32, ttl=settings.lookup_cache_ttl)
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
 
 
 # =============================================================================
@@ -22,6 +37,51 @@ def round_float(value: float | None, decimals: int = 1) -> float:
     return round(float(value), decimals)
 
 
+async def cached_query(cache: TTLCache, func: Callable[..., Any], *args: Any) -> Any:
+    """Run a service query in the threadpool, reusing a cached result if one is fresh.
+
+    Cached results are shared between requests and must not be mutated.
+    """
+    key = (func.__name__, *args)
+    try:
+        return cache[key]
+    except KeyError:
+        pass
+    result = await run_in_threadpool(func, *args)
+    cache[key] = result
+    return result
+
+
+def clear_caches() -> None:
+    """Drop all cached analytics query results."""
+    _analytics_cache.clear()
+    _lookup_cache.clear()
+    clear_query_caches()
+
+
+def wants_ndjson(request: Request) -> bool:
+    """Whether the client asked for a streamed NDJSON response."""
+    return NDJSON_MEDIA_TYPE in request.headers.get("accept", "")
+
+
+async def stream_ndjson(batches: Iterator[list[dict]]) -> StreamingResponse:
+    """Stream row batches as NDJSON, one JSON object per line.
+
+    The first batch is fetched before the response starts, so query errors
+    still produce a regular error response instead of a truncated stream.
+    """
+    first = await run_in_threadpool(next, batches, [])
+
+    def encode() -> Iterator[bytes]:
+        for batch in chain([first], batches):
+            yield b"".join(orjson.dumps(row) + b"\n" for row in batch)
+
+    # The same URL serves JSON without this Accept header, so caches must key on it
+    return StreamingResponse(
+        encode(), media_type=NDJSON_MEDIA_TYPE, headers={"Vary": "Accept"}
+    )
+
+
 # =============================================================================
 # Response Models
 # =============================================================================
@@ -92,6 +152,7 @@ class PropertiesResponse(BaseModel):
     """Response for properties endpoint."""
     city: str
     properties: list[Property]
+    total_count: int
     city_averages: dict[str, CityAverages]
 
 
@@ -121,6 +182,7 @@ class TopAmenityCity(BaseModel):
 class TopAmenitiesResponse(BaseModel):
     """Response for top amenities by city."""
     data: list[TopAmenityCity]
+    total_count: int
 
 
 class DeviceFunnel(BaseModel):
@@ -165,7 +227,7 @@ async def get_cities(
     service: LakebaseService = Depends(get_lakebase_service)
 ):
     """Get list of all cities for dropdowns."""
-    cities = await run_in_threadpool(service.get_cities)
+    cities = await cached_query(_lookup_cache, service.get_cities)
     return {"cities": cities}
 
 
@@ -174,7 +236,7 @@ async def get_city_investment(
     service: LakebaseService = Depends(get_lakebase_service)
 ):
     """Get city investment matrix data for the overview tab."""
-    data = await run_in_threadpool(service.get_city_investment)
+    data = await cached_query(_analytics_cache, service.get_city_investment)
 
     # Round float values for cleaner UI display
     rounded_data = [
@@ -195,36 +257,28 @@ async def get_city_funnel(
     service: LakebaseService = Depends(get_lakebase_service)
 ):
     """Get conversion funnel data by city."""
-    return await run_in_threadpool(service.get_city_funnel, city, days)
+    return await cached_query(_analytics_cache, service.get_city_funnel, city, days)
 
 
 @router.get("/properties", response_model=PropertiesResponse)
 async def get_properties(
+    request: Request,
     city: str | None = Query(None, description="Filter by city (or 'all')"),
+    limit: int | None = Query(
+        None, ge=1, le=1000, description="Page size (default: all properties)"
+    ),
+    offset: int = Query(0, ge=0, description="Number of properties to skip"),
     service: LakebaseService = Depends(get_lakebase_service)
 ):
-    """Get property performance data with city averages and bucket categorization."""
-    result = await run_in_threadpool(service.get_properties, city)
+    """Get property performance data with city averages and bucket categorization.
 
-    # Transform properties with rounded floats
-    formatted_properties = [
-        {
-            "id": str(p["id"]),
-            "name": p["name"] or "",
-            "city": p["city"] or "",
-            "property_type": p["property_type"],
-            "views": int(p["views"] or 0),
-            "bookings": int(p["bookings"] or 0),
-            "initiation_rate": round_float(p["initiation_rate"]),
-            "completion_rate": round_float(p["completion_rate"]),
-            "cancel_rate": round_float(p["cancel_rate"]),
-            "payment_fail_rate": round_float(p["payment_fail_rate"]),
-            "avg_review_rating": round_float(p["avg_review_rating"]) if p["avg_review_rating"] else None,
-            "revenue": round_float(p["revenue"]),
-            "bucket": p["bucket"],
-        }
-        for p in result["properties"]
-    ]
+    Send `Accept: application/x-ndjson` to stream the properties as NDJSON
+    rows instead (without city averages).
+    """
+    if wants_ndjson(request):
+        return await stream_ndjson(service.stream_properties(city, limit, offset))
+
+    result = await cached_query(_analytics_cache, service.get_properties, city, limit, offset)
 
     # Round city averages
     formatted_averages = {
@@ -236,11 +290,15 @@ async def get_properties(
         for c, avg in result["city_averages"].items()
     }
 
-    return {
+    # Rows are already shaped, typed and rounded in SQL. Returning the response
+    # directly skips re-validating every row against the response model, which
+    # otherwise costs more than encoding them; the model still documents the schema.
+    return ORJSONResponse({
         "city": city or "All Cities",
-        "properties": formatted_properties,
+        "properties": result["properties"],
+        "total_count": result["total_count"],
         "city_averages": formatted_averages,
-    }
+    })
 
 
 @router.get("/amenities", response_model=AmenitiesResponse)
@@ -250,7 +308,7 @@ async def get_amenities(
     service: LakebaseService = Depends(get_lakebase_service)
 ):
     """Get amenity lift data."""
-    amenities = await run_in_threadpool(service.get_amenities, city, property_type)
+    amenities = await cached_query(_analytics_cache, service.get_amenities, city, property_type)
 
     formatted_amenities = [
         {"name": a["name"], "lift": round_float(a["lift"]), "impact_tier": a["impact_tier"]}
@@ -266,23 +324,22 @@ async def get_amenities(
 
 @router.get("/amenities/top-by-city", response_model=TopAmenitiesResponse)
 async def get_top_amenities_by_city(
+    request: Request,
+    limit: int | None = Query(None, ge=1, le=1000, description="Page size (default: all rows)"),
+    offset: int = Query(0, ge=0, description="Number of rows to skip"),
     service: LakebaseService = Depends(get_lakebase_service)
 ):
-    """Get top 3 amenities for each city."""
-    data = await run_in_threadpool(service.get_top_amenities_by_city)
+    """Get top 3 amenities for each city.
 
-    formatted_data = [
-        {
-            "city": row["city"],
-            "property_type": row["property_type"],
-            "amenity_name": row["amenity_name"],
-            "lift": round_float(row["lift"]),
-            "rank": int(row["rank"] or 0)
-        }
-        for row in data
-    ]
+    Send `Accept: application/x-ndjson` to stream the rows as NDJSON instead.
+    """
+    if wants_ndjson(request):
+        return await stream_ndjson(service.stream_top_amenities_by_city(limit, offset))
 
-    return {"data": formatted_data}
+    # Only a few rows per city, so validating against the response model is cheap
+    return await cached_query(
+        _analytics_cache, service.get_top_amenities_by_city, limit, offset
+    )
 
 
 @router.get("/device-metrics", response_model=DeviceMetricsResponse)
@@ -292,7 +349,7 @@ async def get_device_metrics(
     service: LakebaseService = Depends(get_lakebase_service)
 ):
     """Get device-segmented funnel and trends."""
-    result = await run_in_threadpool(service.get_device_metrics, city, weeks)
+    result = await cached_query(_analytics_cache, service.get_device_metrics, city, weeks)
 
     # Round float values in weekly trends
     rounded_trends = [
@@ -329,5 +386,5 @@ async def get_property_types(
     service: LakebaseService = Depends(get_lakebase_service)
 ):
     """Get list of distinct property types."""
-    property_types = await run_in_threadpool(service.get_property_types)
+    property_types = await cached_query(_lookup_cache, service.get_property_types)
     return {"property_types": property_types}
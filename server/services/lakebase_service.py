@@ -1,26 +1,295 @@
 """Lakebase Provisioned service for marketplace analytics queries."""
 
+import hashlib
+import logging
+import os
+import re
+import threading
 import time
 import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import contextmanager
-from typing import Any
+from datetime import date, timedelta
+from functools import cache, lru_cache
+from typing import Any, Iterator
 
 import psycopg2
-from psycopg2 import pool
+from cachetools import TTLCache, cached
+from cachetools.keys import hashkey
 from databricks.sdk import WorkspaceClient
+from psycopg2 import pool
+from psycopg2.extensions import connection as PgConnection
 
 from server.config import get_settings
 from server.exceptions import DatabaseConnectionError, DatabaseQueryError
 
+logger = logging.getLogger(__name__)
+
 # Load settings
 settings = get_settings()
 
-# Token cache (refresh interval from settings)
-_token_cache: dict[str, Any] = {"token": None, "expires_at": 0}
+# Token cache (refresh interval from settings). Replaced as a whole dict so
+# readers always see a matching token and expiry.
+_token_cache: dict[str, Any] = {"token": None, "issued_at": 0, "expires_at": 0}
+_token_lock = threading.Lock()
+_token_refresher: threading.Thread | None = None
+
+# The background refresher renews the token once this fraction of its cache
+# lifetime has passed, and retries this often (seconds) after a failed refresh
+_TOKEN_REFRESH_AT = 0.8
+_TOKEN_RETRY_DELAY = 30
 
 # Connection pool (lazy initialization)
 _connection_pool: pool.ThreadedConnectionPool | None = None
 _pool_config: dict[str, Any] | None = None
+_pool_lock = threading.Lock()
+
+# Pool bounds. Without an explicit pool_max_connections the pool scales with
+# the host's cores (4 per core, at least 8), capped at 32: past that, Postgres
+# response times stop improving and connections only add server load.
+_POOL_MAX = settings.pool_max_connections or min(32, max(8, 4 * (os.cpu_count() or 1)))
+_POOL_MIN = min(_POOL_MAX, max(settings.pool_min_connections, _POOL_MAX // 4))
+
+# A checkout waiting longer than this means the pool is too small for the
+# load; the warning is repeated at most once per interval
+_POOL_WAIT_WARN_SECONDS = 0.005
+_POOL_WARN_INTERVAL = 60
+
+# Executor for fanning out independent queries. Each task checks out its own
+# pooled connection, so keep it well below the pool size to leave connections
+# for requests that query directly.
+_query_executor = ThreadPoolExecutor(
+    max_workers=max(1, _POOL_MAX // 2),
+    thread_name_prefix="lakebase-query",
+)
+
+# %(name)s placeholders, rewritten to $n parameters for PREPARE
+_PARAM_PATTERN = re.compile(r"%\((\w+)\)s")
+
+# Latest date per (table, column). Look-back filters compare against a
+# date computed from it instead of re-running MAX() as a subquery each time.
+_latest_date_cache: TTLCache = TTLCache(maxsize=8, ttl=settings.analytics_cache_ttl)
+_latest_date_lock = threading.Lock()
+
+# All-cities device diagnosis. Its MODE() aggregates sort the whole table,
+# and the result only changes with a new ingestion batch.
+_diagnosis_cache: TTLCache = TTLCache(maxsize=1, ttl=settings.lookup_cache_ttl)
+_diagnosis_lock = threading.Lock()
+
+# Top amenities, rounded and typed in SQL so rows match the response shape.
+# total_count is the unpaged row count, evaluated before LIMIT/OFFSET.
+_TOP_AMENITIES_QUERY = """
+    SELECT
+        city,
+        property_type,
+        amenity_name,
+        ROUND(COALESCE(confirmation_lift, 0)::numeric, 1)::float8 AS lift,
+        COALESCE(rank, 0)::int AS rank,
+        COUNT(*) OVER () AS total_count
+    FROM {schema}.amenity_city_top
+    ORDER BY city, rank, property_type, amenity_name
+    LIMIT %(limit)s OFFSET %(offset)s
+"""
+
+
+class _PreparingConnection(PgConnection):
+    """Connection that remembers which statements it has prepared.
+
+    Prepared statements live in the server session, so the set is dropped
+    together with the connection.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.prepared: set[str] = set()
+
+    def deallocate(self, name: str) -> None:
+        """Drop a prepared statement so the next use prepares it again.
+
+        Rolls back the failed transaction first, since DEALLOCATE cannot run
+        in an aborted one.
+        """
+        self.prepared.discard(name)
+        self.rollback()
+        try:
+            with self.cursor() as cur:
+                cur.execute(f"DEALLOCATE {name}")
+        except psycopg2.OperationalError:
+            raise
+        except psycopg2.Error:
+            self.rollback()  # Statement was never prepared on this session
+
+
+@lru_cache(maxsize=128)
+def _format_sql(sql: str, schema: str) -> str:
+    """Substitute the {schema} placeholder, once per distinct query text."""
+    return sql.format(schema=schema)
+
+
+@lru_cache(maxsize=128)
+def _prepared_statement(sql: str) -> tuple[str, str, str]:
+    """Derive the statement name, PREPARE and EXECUTE text for a query.
+
+    Named %(key)s placeholders become positional $n parameters in the
+    prepared body, and the EXECUTE text passes them back in the same order,
+    so the caller's params dict is used unchanged.
+    """
+    names: list[str] = []
+
+    def to_positional(match: re.Match) -> str:
+        if match.group(1) not in names:
+            names.append(match.group(1))
+        return f"${names.index(match.group(1)) + 1}"
+
+    body = _PARAM_PATTERN.sub(to_positional, sql).replace("%%", "%")
+    name = "q_" + hashlib.blake2b(sql.encode(), digest_size=8).hexdigest()
+    args = ", ".join(f"%({key})s" for key in names)
+    execute = f"EXECUTE {name} ({args})" if names else f"EXECUTE {name}"
+    return name, f"PREPARE {name} AS {body}", execute
+
+
+class _PoolTimeout(pool.PoolError):
+    """No connection was returned to the pool within its checkout timeout."""
+
+
+class _TokenAuthPool(pool.ThreadedConnectionPool):
+    """Threaded pool that opens every new connection with the current OAuth token.
+
+    A plain pool keeps the password it was created with, so connections opened
+    after that token expires fail to authenticate. It also raises PoolError as
+    soon as all connections are checked out; this pool instead waits up to
+    `timeout` seconds for one to be returned, so concurrent requests and query
+    fan-out queue for a connection rather than fail.
+
+    Checkout wait times are kept for the most recent checkouts, for pool
+    metrics and a rate-limited warning when the pool is too small.
+    """
+
+    def __init__(self, minconn, maxconn, *args, token_provider, timeout, **kwargs):
+        self._token_provider = token_provider
+        self._timeout = timeout
+        self._slots = threading.BoundedSemaphore(maxconn)
+        self._waits: deque[float] = deque(maxlen=1024)
+        self._last_warning = 0.0
+        super().__init__(minconn, maxconn, *args, password=token_provider(), **kwargs)
+
+    def getconn(self, key=None):
+        started = time.perf_counter()
+        if not self._slots.acquire(timeout=self._timeout):
+            raise _PoolTimeout(f"no connection available within {self._timeout}s")
+        waited = time.perf_counter() - started
+        self._waits.append(waited)
+        if waited > _POOL_WAIT_WARN_SECONDS:
+            self._warn_if_saturated()
+        try:
+            # Fetched before super() takes the pool lock: after a token drop this
+            # is an HTTP round trip, which must not stall other checkouts/returns
+            self._kwargs["password"] = self._token_provider()
+            return super().getconn(key)
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def putconn(self, conn=None, key=None, close=False):
+        try:
+            super().putconn(conn, key, close)
+        except pool.PoolError:
+            if not self.closed:
+                raise
+            # Checked out before the pool was retired; just drop it
+            conn.close()
+        finally:
+            self._slots.release()
+
+    def retire(self) -> None:
+        """Close the idle connections and stop accepting returned ones.
+
+        Unlike closeall(), connections still checked out are left open so
+        their in-flight queries can finish; putconn closes them on return.
+        """
+        with self._lock:
+            self.closed = True
+            for conn in self._pool:
+                try:
+                    conn.close()
+                except Exception:
+                    pass  # Connection might already be in bad state
+            self._pool.clear()
+
+    def _warn_if_saturated(self) -> None:
+        """Log when the p95 checkout wait is over the threshold, at most once per interval."""
+        now = time.monotonic()
+        if now - self._last_warning < _POOL_WARN_INTERVAL:
+            return
+        p95 = _percentile(sorted(self._waits), 0.95)
+        if p95 > _POOL_WAIT_WARN_SECONDS:
+            self._last_warning = now
+            logger.warning(
+                "Lakebase pool saturated: p95 checkout wait %.1f ms (maxconn=%d); "
+                "consider raising POOL_MAX_CONNECTIONS", p95 * 1000, self.maxconn
+            )
+
+    def stats(self) -> dict[str, Any]:
+        """Pool size gauges and checkout wait percentiles in milliseconds."""
+        waits = sorted(self._waits)
+        return {
+            "min_connections": self.minconn,
+            "max_connections": self.maxconn,
+            "in_use": len(self._used),
+            "idle": len(self._pool),
+            "recent_checkouts": len(waits),
+            "wait_p50_ms": round(_percentile(waits, 0.50) * 1000, 3),
+            "wait_p95_ms": round(_percentile(waits, 0.95) * 1000, 3),
+            "wait_max_ms": round(waits[-1] * 1000, 3) if waits else 0.0,
+        }
+
+
+def _percentile(sorted_values: list[float], fraction: float) -> float:
+    """Nearest-rank percentile of an already sorted list (0.0 when empty)."""
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+
+def pool_stats() -> dict[str, Any] | None:
+    """Snapshot of connection pool usage, or None before the pool is created."""
+    conn_pool = _connection_pool
+    return conn_pool.stats() if conn_pool is not None else None
+
+
+# Per-city window aggregates carried on every property row
+_CITY_AVERAGE_COLUMNS = ("avg_views", "avg_initiation_rate", "property_count")
+
+
+def _drop_window_columns(row: dict) -> None:
+    """Remove the window aggregate columns from a property row."""
+    for key in _CITY_AVERAGE_COLUMNS:
+        del row[key]
+    del row["total_count"]
+
+
+@cache
+def _ws() -> WorkspaceClient:
+    """Get the shared Databricks WorkspaceClient.
+
+    Building one resolves auth config and sets up an HTTP session, so it is
+    done once per process.
+    """
+    return WorkspaceClient()
+
+
+def _reset_ws() -> None:
+    """Drop the shared WorkspaceClient so the next call re-resolves its config."""
+    _ws.cache_clear()
+
+
+def clear_query_caches() -> None:
+    """Drop cached latest dates and diagnosis aggregates so they are re-read."""
+    with _latest_date_lock:
+        _latest_date_cache.clear()
+    with _diagnosis_lock:
+        _diagnosis_cache.clear()
 
 
 class LakebaseService:
@@ -31,107 +300,255 @@ class LakebaseService:
         self.schema = settings.lakebase_schema
         self.instance_name = settings.lakebase_instance_name
 
-    def _get_workspace_client(self) -> WorkspaceClient:
-        """Get Databricks WorkspaceClient."""
-        return WorkspaceClient()
-
     def _get_fresh_token(self) -> str:
-        """Generate a fresh OAuth token for Lakebase."""
+        """Get the cached OAuth token for Lakebase, generating one if it is stale."""
+        cache = _token_cache
+        if cache["token"] and time.time() < cache["expires_at"]:
+            return cache["token"]
+
+        with _token_lock:
+            # Another thread may have refreshed while we waited for the lock
+            cache = _token_cache
+            if cache["token"] and time.time() < cache["expires_at"]:
+                return cache["token"]
+            return self._generate_token()
+
+    def _generate_token(self) -> str:
+        """Generate a fresh OAuth token and swap it into the cache.
+
+        Callers must hold _token_lock.
+        """
         global _token_cache
 
         now = time.time()
-        if _token_cache["token"] and now < _token_cache["expires_at"]:
-            return _token_cache["token"]
-
-        w = self._get_workspace_client()
+        w = _ws()
         cred = w.database.generate_database_credential(
             request_id=str(uuid.uuid4()),
             instance_names=[self.instance_name]
         )
 
-        _token_cache["token"] = cred.token
-        _token_cache["expires_at"] = now + settings.token_refresh_interval
-
+        _token_cache = {
+            "token": cred.token,
+            "issued_at": now,
+            "expires_at": now + settings.token_refresh_interval,
+        }
         return cred.token
 
+    def _start_token_refresher(self) -> None:
+        """Start the background token refresh thread, once per process."""
+        global _token_refresher
+
+        if _token_refresher is None or not _token_refresher.is_alive():
+            _token_refresher = threading.Thread(
+                target=self._refresh_token_loop, name="lakebase-token-refresh", daemon=True
+            )
+            _token_refresher.start()
+
+    def _refresh_token_loop(self) -> None:
+        """Renew the token at 80% of its lifetime, so requests never wait on it."""
+        while True:
+            cache = _token_cache
+            lifetime = cache["expires_at"] - cache["issued_at"]
+            refresh_at = cache["issued_at"] + _TOKEN_REFRESH_AT * lifetime
+            delay = refresh_at - time.time()
+            if delay > 0:
+                time.sleep(delay)
+                continue
+            try:
+                with _token_lock:
+                    self._generate_token()
+            except Exception as e:
+                # Requests fall back to generating the token themselves
+                logger.warning("Lakebase token refresh failed: %s", e)
+                time.sleep(_TOKEN_RETRY_DELAY)
+
     def _get_connection_pool(self) -> pool.ThreadedConnectionPool:
-        """Get or create a connection pool."""
+        """Get or create a connection pool.
+
+        The existing pool is returned without locking. Creation is guarded by
+        _pool_lock so concurrent first requests build only one pool.
+        """
         global _connection_pool, _pool_config
 
-        w = self._get_workspace_client()
-        instance = w.database.get_database_instance(name=self.instance_name)
-        current_user = w.current_user.me()
-        username = current_user.user_name
-
-        # Create pool if it doesn't exist
-        if _connection_pool is None:
-            _pool_config = {
-                "host": instance.read_write_dns,
-                "port": 5432,
-                "dbname": "databricks_postgres",
-                "user": username,
-                "sslmode": "require"
-            }
-            _connection_pool = pool.ThreadedConnectionPool(
-                minconn=settings.pool_min_connections,
-                maxconn=settings.pool_max_connections,
-                **_pool_config,
-                password=self._get_fresh_token()
-            )
+        if _connection_pool is not None:
+            return _connection_pool
+
+        with _pool_lock:
+            if _connection_pool is None:
+                # Host and user don't change, so look them up only once and
+                # reuse them when the pool is rebuilt after a reset
+                if _pool_config is None:
+                    w = _ws()
+                    host = settings.lakebase_host
+                    if host is None:
+                        instance = w.database.get_database_instance(name=self.instance_name)
+                        host = instance.read_write_dns
+                    _pool_config = {
+                        "host": host,
+                        "port": settings.lakebase_port,
+                        "dbname": "databricks_postgres",
+                        "user": w.current_user.me().user_name,
+                        "sslmode": "require"
+                    }
+                _connection_pool = _TokenAuthPool(
+                    minconn=_POOL_MIN,
+                    maxconn=_POOL_MAX,
+                    **_pool_config,
+                    connection_factory=_PreparingConnection,
+                    token_provider=self._get_fresh_token,
+                    timeout=settings.pool_timeout,
+                )
+                self._start_token_refresher()
 
         return _connection_pool
 
-    def _reset_pool(self):
-        """Reset connection pool to force fresh token on next connection."""
+    def _reset_pool(
+        self, failed_pool: pool.ThreadedConnectionPool | None, drop_token: bool = False
+    ):
+        """Retire the connection pool so the next checkout builds a fresh one.
+
+        `failed_pool` is the pool the caller's failure came from, or None if
+        building the pool failed. When several threads hit the same failure,
+        only the first one resets: the others see the current pool is no
+        longer the one that failed for them and leave it alone. This includes
+        a pool another thread built after this caller's build failed.
+
+        The cached host and user are kept. Connections other threads still
+        have checked out are not closed until they are returned. The token
+        and WorkspaceClient are only discarded when opening a connection
+        failed, since the token is refreshed in the background otherwise.
+        """
         global _connection_pool, _token_cache
-        if _connection_pool is not None:
+        with _pool_lock:
+            if failed_pool is not _connection_pool:
+                return
+            if _connection_pool is not None:
+                _connection_pool.retire()
+                _connection_pool = None
+            if drop_token:
+                _token_cache = {"token": None, "issued_at": 0, "expires_at": 0}
+                _reset_ws()
+
+    def warm_up(self) -> None:
+        """Open the connection pool ahead of the first query.
+
+        Resolves the instance host, generates a credential and opens the
+        pool's minimum connections, so no request pays for that setup.
+        """
+        self._get_connection_pool()
+
+    def _checkout(self) -> tuple[pool.ThreadedConnectionPool, PgConnection]:
+        """Check out a connection, rebuilding the pool once if connecting fails.
+
+        A pool that another thread has just reset is also retried once, with
+        the rebuilt pool.
+        """
+        for attempt in range(2):
+            conn_pool = None  # Stays None if building the pool failed
             try:
-                _connection_pool.closeall()
-            except Exception:
-                pass  # Pool might already be in bad state
-            _connection_pool = None
-        _token_cache = {"token": None, "expires_at": 0}
+                conn_pool = self._get_connection_pool()
+                return conn_pool, conn_pool.getconn()
+            except psycopg2.OperationalError as e:
+                if attempt:
+                    raise DatabaseConnectionError(detail=str(e))
+                # Token rejected or connection failed - reset pool and retry
+                self._reset_pool(conn_pool, drop_token=True)
+            except _PoolTimeout as e:
+                # Every connection stayed checked out for the whole timeout
+                raise DatabaseConnectionError(detail=str(e))
+            except pool.PoolError as e:
+                if attempt:
+                    raise DatabaseConnectionError(detail=str(e))
+                # Another thread reset the pool after we fetched it - use the new one
 
     @contextmanager
     def get_connection(self):
-        """Context manager for database connections with automatic token refresh."""
+        """Context manager for database connections with automatic token refresh.
+
+        Connections are not probed on checkout. A connection the server has
+        dropped fails its query with OperationalError instead; the pool is
+        then reset, since its other idle connections are likely dead too.
+        """
+        conn_pool, conn = self._checkout()
         try:
-            conn_pool = self._get_connection_pool()
-            conn = conn_pool.getconn()
-            try:
-                # Test the connection is still valid
-                conn.cursor().execute("SELECT 1")
-                yield conn
-            finally:
-                conn_pool.putconn(conn)
-        except psycopg2.OperationalError as e:
-            # Token expired or connection failed - reset pool and retry
-            self._reset_pool()
+            yield conn
+        finally:
+            # Checked before putconn, which closes surplus healthy connections
+            broken = bool(conn.closed)
+            conn_pool.putconn(conn)
+            if broken:
+                self._reset_pool(conn_pool)
+
+    def execute_query(self, sql: str, params: dict | None = None) -> list[dict]:
+        """Execute a query and return results as list of dicts.
+
+        Each query is prepared once per connection and then run with EXECUTE,
+        so repeat calls skip parsing and planning on the server (unless
+        prepare_statements is off). If the connection turns out to be dead,
+        the query is retried once on a fresh connection.
+        """
+        # Replace {schema} placeholder with actual schema name
+        formatted_sql = _format_sql(sql, self.schema)
+
+        for attempt in range(2):
             try:
-                conn_pool = self._get_connection_pool()
-                conn = conn_pool.getconn()
-                try:
-                    yield conn
-                finally:
-                    conn_pool.putconn(conn)
-            except psycopg2.OperationalError as retry_error:
-                raise DatabaseConnectionError(detail=str(retry_error))
-
-    def execute_query(self, sql: str, params: tuple | None = None) -> list[dict]:
-        """Execute a query and return results as list of dicts."""
+                with self.get_connection() as conn:
+                    with conn.cursor() as cur:
+                        if settings.prepare_statements:
+                            name, prepare, execute = _prepared_statement(formatted_sql)
+                            if name not in conn.prepared:
+                                try:
+                                    cur.execute(prepare)
+                                except psycopg2.errors.DuplicatePreparedStatement:
+                                    # Prepared by an earlier client of this session (e.g.
+                                    # behind a session-mode pooler); the name is the query hash
+                                    conn.rollback()
+                                conn.prepared.add(name)
+                            try:
+                                cur.execute(execute, params)
+                            except psycopg2.OperationalError:
+                                raise
+                            except psycopg2.Error:
+                                # The statement may keep failing on this session (e.g.
+                                # a stale cached plan), so prepare it afresh next time
+                                conn.deallocate(name)
+                                raise
+                        else:
+                            cur.execute(formatted_sql, params)
+                        columns = [desc[0] for desc in cur.description]
+                        rows = cur.fetchall()
+                        return [dict(zip(columns, row)) for row in rows]
+            except DatabaseConnectionError:
+                raise  # Re-raise our custom exceptions
+            except psycopg2.extensions.QueryCanceledError as e:
+                # Statement timeouts are query failures, not connection failures
+                raise DatabaseQueryError(detail=str(e))
+            except psycopg2.OperationalError as e:
+                # get_connection has already reset the pool if the connection died
+                if attempt:
+                    raise DatabaseConnectionError(detail=str(e))
+            except psycopg2.Error as e:
+                raise DatabaseQueryError(detail=str(e))
+
+    def stream_query(
+        self, sql: str, params: dict | None = None, batch_size: int = 1000
+    ) -> Iterator[list[dict]]:
+        """Execute a query and yield results in batches of dicts.
+
+        Uses a server-side (named) cursor, so only one batch is held in memory
+        at a time. The pooled connection stays checked out until the generator
+        is exhausted or closed.
+        """
         try:
             with self.get_connection() as conn:
-                with conn.cursor() as cur:
-                    # Replace {schema} placeholder with actual schema name
-                    formatted_sql = sql.format(schema=self.schema)
-                    cur.execute(formatted_sql, params)
-                    columns = [desc[0] for desc in cur.description]
-                    rows = cur.fetchall()
-                    return [dict(zip(columns, row)) for row in rows]
+                with conn.cursor(name=f"stream_{uuid.uuid4().hex}") as cur:
+                    cur.itersize = batch_size
+                    cur.execute(_format_sql(sql, self.schema), params)
+                    while rows := cur.fetchmany(batch_size):
+                        columns = [desc[0] for desc in cur.description]
+                        yield [dict(zip(columns, row)) for row in rows]
         except DatabaseConnectionError:
             raise  # Re-raise our custom exceptions
-        except psycopg2.ProgrammingError as e:
-            raise DatabaseQueryError(detail=str(e))
         except psycopg2.Error as e:
             raise DatabaseQueryError(detail=str(e))
 
@@ -161,12 +578,43 @@ class LakebaseService:
             ORDER BY estimated_revenue DESC
         """)
 
+    @cached(
+        _latest_date_cache,
+        key=lambda self, table, column: hashkey(table, column),
+        lock=_latest_date_lock,
+    )
+    def _latest_date(self, table: str, column: str) -> date | None:
+        """Get the latest value of a date column, cached for analytics_cache_ttl."""
+        rows = self.execute_query(f"SELECT MAX({column}) AS latest FROM {{schema}}.{table}")
+        return rows[0]["latest"]
+
+    @cached(_diagnosis_cache, key=lambda self: hashkey(self.schema), lock=_diagnosis_lock)
+    def _all_cities_diagnosis(self) -> list[dict]:
+        """Aggregate the device diagnosis across all cities, cached for lookup_cache_ttl."""
+        return self.execute_query("""
+            SELECT
+                AVG(desktop_rate) AS desktop_rate,
+                AVG(mobile_rate) AS mobile_rate,
+                AVG(tablet_rate) AS tablet_rate,
+                AVG(device_gap_pct) AS device_gap,
+                MODE() WITHIN GROUP (ORDER BY diagnosis) AS diagnosis,
+                MODE() WITHIN GROUP (ORDER BY mobile_trend) AS mobile_trend
+            FROM {schema}.device_diagnosis
+        """)
+
+    def _since(self, table: str, column: str, lookback: timedelta) -> date | None:
+        """Start of a look-back window ending at the table's latest date."""
+        latest = self._latest_date(table, column)
+        return latest - lookback if latest is not None else None
+
     def get_city_funnel(self, city: str | None = None, days: int = 90) -> dict:
         """Get conversion funnel data, optionally filtered by city.
 
         Uses the max event_date in the table as reference point for date filtering
         (handles historical datasets that may not have recent data).
         """
+        since = self._since("city_funnel", "event_date", timedelta(days=days))
+
         if city and city.lower() != "all":
             rows = self.execute_query("""
                 SELECT
@@ -174,9 +622,9 @@ class LakebaseService:
                     SUM(initiated_bookers) AS bookers,
                     SUM(completers) AS completed
                 FROM {schema}.city_funnel
-                WHERE city = %s
-                  AND event_date >= (SELECT MAX(event_date) FROM {schema}.city_funnel) - INTERVAL '%s days'
-            """, (city, days))
+                WHERE city = %(city)s
+                  AND event_date >= %(since)s
+            """, {"city": city, "since": since})
         else:
             rows = self.execute_query("""
                 SELECT
@@ -184,8 +632,8 @@ class LakebaseService:
                     SUM(initiated_bookers) AS bookers,
                     SUM(completers) AS completed
                 FROM {schema}.city_funnel
-                WHERE event_date >= (SELECT MAX(event_date) FROM {schema}.city_funnel) - INTERVAL '%s days'
-            """, (days,))
+                WHERE event_date >= %(since)s
+            """, {"since": since})
 
         row = rows[0] if rows else {"viewers": 0, "bookers": 0, "completed": 0}
         return {
@@ -198,94 +646,146 @@ class LakebaseService:
             }
         }
 
-    def get_properties(self, city: str | None = None) -> dict:
-        """Get property performance data with city averages and bucket categorization.
+    def _properties_query(
+        self, city: str | None, limit: int | None = None, offset: int = 0
+    ) -> tuple[str, dict]:
+        """Build the property performance query, optionally filtered by city and paged.
 
-        Returns all properties for the city (or all cities) with:
-        - Key performance metrics only (optimized for performance)
-        - City averages for color coding
-        - Bucket category (promote/intervention/at_risk) based on city averages
+        Values are cast and rounded in SQL so rows come back in their final
+        response shape. City averages, counts and the bucket label come from
+        window functions, which are evaluated before LIMIT/OFFSET and so cover
+        every matching property. A limit of None returns all rows (LIMIT NULL).
         """
-        # Base query - only fetch columns needed for display and bucketing
-        base_query = """
+        where_clause = ""
+        if city and city.lower() != "all":
+            where_clause = "WHERE city = %(city)s"
+
+        # Only fetch columns needed for display and bucketing
+        query = f"""
+            WITH scored AS (
+                SELECT
+                    p.*,
+                    AVG(views) OVER city_window AS avg_views,
+                    AVG(raw_initiation_rate) OVER city_window AS avg_initiation_rate,
+                    COUNT(*) OVER city_window AS property_count,
+                    COUNT(*) OVER () AS total_count
+                FROM (
+                    SELECT
+                        property_id,
+                        unique_viewers,
+                        property_id::text AS id,
+                        COALESCE(property_name, '') AS name,
+                        COALESCE(city, '') AS city,
+                        property_type,
+                        COALESCE(unique_viewers, 0)::bigint AS views,
+                        COALESCE(initiated_bookings, 0)::bigint AS bookings,
+                        COALESCE(initiation_rate, 0)::float8 AS raw_initiation_rate,
+                        ROUND(COALESCE(completion_rate, 0)::numeric, 1)::float8 AS completion_rate,
+                        ROUND(COALESCE(cancel_rate, 0)::numeric, 1)::float8 AS cancel_rate,
+                        ROUND(COALESCE(payment_fail_rate, 0)::numeric, 1)::float8
+                            AS payment_fail_rate,
+                        ROUND(NULLIF(avg_review_rating, 0)::numeric, 1)::float8
+                            AS avg_review_rating,
+                        ROUND(COALESCE(total_revenue, 0)::numeric, 1)::float8 AS revenue
+                    FROM {{schema}}.property_performance
+                    {where_clause}
+                ) p
+                WINDOW city_window AS (PARTITION BY city)
+            )
             SELECT
-                property_id AS id,
-                property_name AS name,
-                city,
-                property_type,
-                unique_viewers AS views,
-                initiated_bookings AS bookings,
-                initiation_rate,
-                completion_rate,
-                cancel_rate,
-                payment_fail_rate,
-                avg_review_rating,
-                total_revenue AS revenue
-            FROM {schema}.property_performance
+                id, name, city, property_type, views, bookings,
+                ROUND(raw_initiation_rate::numeric, 1)::float8 AS initiation_rate,
+                completion_rate, cancel_rate, payment_fail_rate, avg_review_rating, revenue,
+                CASE
+                    WHEN raw_initiation_rate > avg_initiation_rate THEN 'promote'
+                    WHEN views > avg_views THEN 'intervention'
+                    ELSE 'at_risk'
+                END AS bucket,
+                avg_views::float8 AS avg_views,
+                avg_initiation_rate,
+                property_count,
+                total_count
+            FROM scored
+            -- property_id breaks ties so pages are stable
+            ORDER BY unique_viewers DESC, property_id
+            LIMIT %(limit)s OFFSET %(offset)s
         """
+        return query, {"city": city, "limit": limit, "offset": offset}
 
+    def _city_averages(self, city: str | None) -> dict[str, dict]:
+        """Aggregate per-city averages and property counts in SQL, keyed by city."""
+        where_clause = ""
         if city and city.lower() != "all":
-            rows = self.execute_query(
-                base_query + " WHERE city = %s ORDER BY unique_viewers DESC",
-                (city,)
-            )
-        else:
-            rows = self.execute_query(
-                base_query + " ORDER BY unique_viewers DESC"
-            )
+            where_clause = "WHERE city = %(city)s"
 
-        if not rows:
-            return {"properties": [], "city_averages": {}}
+        rows = self.execute_query(f"""
+            SELECT
+                COALESCE(city, '') AS city,
+                AVG(COALESCE(unique_viewers, 0))::float8 AS avg_views,
+                AVG(COALESCE(initiation_rate, 0))::float8 AS avg_initiation_rate,
+                COUNT(*) AS property_count
+            FROM {{schema}}.property_performance
+            {where_clause}
+            GROUP BY 1
+        """, {"city": city})
+        return {row.pop("city"): row for row in rows}
 
-        # Calculate city averages for bucketing and color coding
-        city_data: dict[str, list[dict]] = {}
-        for row in rows:
-            c = row["city"]
-            if c not in city_data:
-                city_data[c] = []
-            city_data[c].append(row)
+    def get_properties(
+        self, city: str | None = None, limit: int | None = None, offset: int = 0
+    ) -> dict:
+        """Get property performance data with city averages and bucket categorization.
+
+        Returns one page of properties for the city (or all cities) with:
+        - Key performance metrics only, already typed and rounded for the response
+        - City averages for color coding, computed over all matching properties
+        - Bucket category (promote/intervention/at_risk) based on city averages
+        - Total number of matching properties, for paging
+        """
+        rows = self.execute_query(*self._properties_query(city, limit, offset))
+        single_city = bool(city and city.lower() != "all")
 
-        # Calculate averages per city (only metrics needed for bucketing/display)
         city_averages: dict[str, dict] = {}
-        for c, props in city_data.items():
-            n = len(props)
-            city_averages[c] = {
-                "avg_views": sum(p["views"] or 0 for p in props) / n,
-                "avg_initiation_rate": sum(p["initiation_rate"] or 0 for p in props) / n,
-                "property_count": n,
-            }
+        if rows:
+            total_count = rows[0]["total_count"]
+            first = rows[0]
+            city_averages[first["city"]] = {key: first[key] for key in _CITY_AVERAGE_COLUMNS}
+        elif offset:
+            # Page past the end: no row carries the window aggregates
+            city_averages = self._city_averages(city)
+            total_count = sum(avg["property_count"] for avg in city_averages.values())
+        else:
+            total_count = 0
 
-        # Assign bucket category to each property based on city averages
         for row in rows:
-            c = row["city"]
-            avg = city_averages[c]
-            views = row["views"] or 0
-            init_rate = row["initiation_rate"] or 0
-
-            if init_rate > avg["avg_initiation_rate"]:
-                row["bucket"] = "promote"
-            elif views > avg["avg_views"]:
-                row["bucket"] = "intervention"
-            else:
-                row["bucket"] = "at_risk"
+            _drop_window_columns(row)
 
         return {
             "properties": rows,
-            "city_averages": city_averages if city and city.lower() != "all" else {},
+            "total_count": total_count,
+            "city_averages": city_averages if single_city else {},
         }
 
+    def stream_properties(
+        self, city: str | None = None, limit: int | None = None, offset: int = 0
+    ) -> Iterator[list[dict]]:
+        """Yield bucketed property rows in batches without loading the full result."""
+        for batch in self.stream_query(*self._properties_query(city, limit, offset)):
+            for row in batch:
+                _drop_window_columns(row)
+            yield batch
+
     def get_amenities(self, city: str | None = None, property_type: str | None = None) -> list[dict]:
         """Get amenity lift data."""
         conditions = []
-        params = []
+        params = {}
 
         if city and city.lower() != "all":
-            conditions.append("city = %s")
-            params.append(city)
+            conditions.append("city = %(city)s")
+            params["city"] = city
 
         if property_type and property_type.lower() != "all":
-            conditions.append("property_type = %s")
-            params.append(property_type)
+            conditions.append("property_type = %(property_type)s")
+            params["property_type"] = property_type
 
         where_clause = "WHERE " + " AND ".join(conditions) if conditions else ""
 
@@ -297,81 +797,85 @@ class LakebaseService:
             FROM {{schema}}.amenity_lift
             {where_clause}
             ORDER BY confirmation_lift DESC
-        """, tuple(params) if params else None)
+        """, params or None)
+
+    def get_top_amenities_by_city(self, limit: int | None = None, offset: int = 0) -> dict:
+        """Get one page of the top 3 amenities per city, with the total row count."""
+        rows = self.execute_query(_TOP_AMENITIES_QUERY, {"limit": limit, "offset": offset})
+
+        if rows:
+            total_count = rows[0]["total_count"]
+        elif offset:
+            # Page past the end: no row carries the window count
+            total_count = self.execute_query(
+                "SELECT COUNT(*) AS n FROM {schema}.amenity_city_top"
+            )[0]["n"]
+        else:
+            total_count = 0
 
-    def get_top_amenities_by_city(self) -> list[dict]:
-        """Get top 3 amenities per city."""
-        return self.execute_query("""
-            SELECT
-                city,
-                property_type,
-                amenity_name,
-                confirmation_lift AS lift,
-                rank
-            FROM {schema}.amenity_city_top
-            ORDER BY city, rank
-        """)
+        for row in rows:
+            del row["total_count"]
+        return {"data": rows, "total_count": total_count}
+
+    def stream_top_amenities_by_city(
+        self, limit: int | None = None, offset: int = 0
+    ) -> Iterator[list[dict]]:
+        """Yield top amenities per city in batches without loading the full result."""
+        for batch in self.stream_query(_TOP_AMENITIES_QUERY, {"limit": limit, "offset": offset}):
+            for row in batch:
+                del row["total_count"]
+            yield batch
 
     def get_device_metrics(self, city: str | None = None, weeks: int = 6) -> dict:
         """Get device-segmented funnel and trends.
 
         Uses the max week_start in the table as reference point for date filtering
         (handles historical datasets that may not have recent data).
+
+        Funnel totals and weekly trends come from a single grouped query. The
+        diagnosis reads a different table, so it runs concurrently on a second
+        pooled connection.
         """
         city_filter = ""
-        params: tuple = (weeks,)
+        params = {
+            "since": self._since("device_funnel", "week_start", timedelta(weeks=weeks)),
+            "city": city,
+        }
 
         if city and city.lower() != "all":
-            city_filter = "AND city = %s"
-            params = (weeks, city)
+            city_filter = "AND city = %(city)s"
 
-        # Device funnel totals
-        funnel_rows = self.execute_query(f"""
+        # Device funnel totals and weekly trends in one scan: the (device)
+        # grouping set gives the totals, (week, device) the weekly rates
+        funnel_future = _query_executor.submit(self.execute_query, f"""
+            WITH recent AS (
+                SELECT
+                    DATE_TRUNC('week', week_start) AS week,
+                    device,
+                    viewers,
+                    initiated_bookers,
+                    completers,
+                    completion_rate
+                FROM {{schema}}.device_funnel
+                WHERE week_start >= %(since)s
+                {city_filter}
+            )
             SELECT
+                GROUPING(week) = 1 AS is_total,
+                week,
                 device,
                 SUM(viewers) AS viewers,
                 SUM(initiated_bookers) AS bookers,
-                SUM(completers) AS completed
-            FROM {{schema}}.device_funnel
-            WHERE week_start >= (SELECT MAX(week_start) FROM {{schema}}.device_funnel) - INTERVAL '%s weeks'
-            {city_filter}
-            GROUP BY device
-        """, params)
-
-        device_funnel = {}
-        for row in funnel_rows:
-            device_funnel[row["device"]] = {
-                "viewers": int(row["viewers"] or 0),
-                "bookers": int(row["bookers"] or 0),
-                "completed": int(row["completed"] or 0)
-            }
-
-        # Weekly trends
-        trend_rows = self.execute_query(f"""
-            SELECT
-                DATE_TRUNC('week', week_start) AS week,
-                device,
+                SUM(completers) AS completed,
                 AVG(completion_rate) AS rate
-            FROM {{schema}}.device_funnel
-            WHERE week_start >= (SELECT MAX(week_start) FROM {{schema}}.device_funnel) - INTERVAL '%s weeks'
-            {city_filter}
-            GROUP BY DATE_TRUNC('week', week_start), device
+            FROM recent
+            GROUP BY GROUPING SETS ((device), (week, device))
             ORDER BY week
         """, params)
 
-        # Transform to weekly trend format
-        weekly_data: dict[str, dict] = {}
-        for row in trend_rows:
-            week_str = row["week"].strftime("W%V") if row["week"] else "Unknown"
-            if week_str not in weekly_data:
-                weekly_data[week_str] = {"week": week_str}
-            weekly_data[week_str][row["device"]] = float(row["rate"] or 0)
-
-        weekly_trends = list(weekly_data.values())
-
         # Device diagnosis
         if city and city.lower() != "all":
-            diagnosis_rows = self.execute_query("""
+            diagnosis_future = _query_executor.submit(self.execute_query, """
                 SELECT
                     desktop_rate,
                     mobile_rate,
@@ -380,21 +884,32 @@ class LakebaseService:
                     diagnosis,
                     mobile_trend
                 FROM {schema}.device_diagnosis
-                WHERE city = %s
-            """, (city,))
+                WHERE city = %(city)s
+            """, {"city": city})
         else:
             # Aggregate diagnosis across all cities
-            diagnosis_rows = self.execute_query("""
-                SELECT
-                    AVG(desktop_rate) AS desktop_rate,
-                    AVG(mobile_rate) AS mobile_rate,
-                    AVG(tablet_rate) AS tablet_rate,
-                    AVG(device_gap_pct) AS device_gap,
-                    MODE() WITHIN GROUP (ORDER BY diagnosis) AS diagnosis,
-                    MODE() WITHIN GROUP (ORDER BY mobile_trend) AS mobile_trend
-                FROM {schema}.device_diagnosis
-            """)
+            diagnosis_future = _query_executor.submit(self._all_cities_diagnosis)
+
+        device_funnel = {}
+        weekly_data: dict[str, dict] = {}
+        for row in funnel_future.result():
+            if row["is_total"]:
+                device_funnel[row["device"]] = {
+                    "viewers": int(row["viewers"] or 0),
+                    "bookers": int(row["bookers"] or 0),
+                    "completed": int(row["completed"] or 0)
+                }
+                continue
+
+            # Transform to weekly trend format
+            week_str = row["week"].strftime("W%V") if row["week"] else "Unknown"
+            if week_str not in weekly_data:
+                weekly_data[week_str] = {"week": week_str}
+            weekly_data[week_str][row["device"]] = float(row["rate"] or 0)
+
+        weekly_trends = list(weekly_data.values())
 
+        diagnosis_rows = diagnosis_future.result()
         diagnosis = diagnosis_rows[0] if diagnosis_rows else {}
 
         return {
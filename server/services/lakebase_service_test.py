@@ -0,0 +1,227 @@
+"""Tests for the prepared statement rewrite and the token auth pool."""
+
+from types import SimpleNamespace
+
+import pytest
+from psycopg2 import OperationalError, pool
+from psycopg2.extensions import TRANSACTION_STATUS_IDLE
+
+from server.exceptions import DatabaseConnectionError
+from server.services import lakebase_service
+from server.services.lakebase_service import _PoolTimeout, _prepared_statement, _TokenAuthPool
+
+
+class FakeConnection:
+    closed = 0
+    info = SimpleNamespace(transaction_status=TRANSACTION_STATUS_IDLE)
+
+    def close(self):
+        self.closed = 1
+
+
+@pytest.fixture
+def connect(monkeypatch):
+    """Replace psycopg2.connect in the pool module; returns the list of kwargs used."""
+    calls = []
+
+    def fake_connect(*args, **kwargs):
+        calls.append(kwargs)
+        return FakeConnection()
+
+    monkeypatch.setattr(pool.psycopg2, "connect", fake_connect)
+    return calls
+
+
+@pytest.fixture
+def service(monkeypatch, connect):
+    """A LakebaseService whose pool opens fake connections, with no Databricks calls."""
+    monkeypatch.setattr(lakebase_service, "_connection_pool", None)
+    monkeypatch.setattr(lakebase_service, "_pool_config", {"host": "db", "user": "me"})
+    monkeypatch.setattr(
+        lakebase_service, "_token_cache", {"token": "tok", "issued_at": 0, "expires_at": 0}
+    )
+    monkeypatch.setattr(lakebase_service, "_POOL_MIN", 1)
+    monkeypatch.setattr(lakebase_service, "_POOL_MAX", 1)
+    monkeypatch.setattr(lakebase_service.settings, "pool_timeout", 0.05)
+    monkeypatch.setattr(lakebase_service, "_reset_ws", lambda: None)
+    service_class = lakebase_service.LakebaseService
+    monkeypatch.setattr(service_class, "_start_token_refresher", lambda self: None)
+    monkeypatch.setattr(service_class, "_get_fresh_token", lambda self: "tok")
+    return service_class()
+
+
+def refuse_first_connect(monkeypatch, before_raise=lambda: None):
+    """Make the next connect attempt fail, then connect normally again."""
+    fake_connect = pool.psycopg2.connect
+    refused = []
+
+    def connect_once_refused(*args, **kwargs):
+        if not refused:
+            refused.append(True)
+            before_raise()
+            raise OperationalError("password authentication failed")
+        return fake_connect(*args, **kwargs)
+
+    monkeypatch.setattr(pool.psycopg2, "connect", connect_once_refused)
+
+
+def make_pool(maxconn=1, timeout=0.05):
+    return _TokenAuthPool(0, maxconn, token_provider=lambda: "tok", timeout=timeout)
+
+
+def test_prepared_statement_rewrites_named_params_in_order():
+    name, prepare, execute = _prepared_statement(
+        "SELECT * FROM t WHERE a = %(a)s AND b = %(b)s LIMIT %(limit)s"
+    )
+
+    assert prepare == f"PREPARE {name} AS SELECT * FROM t WHERE a = $1 AND b = $2 LIMIT $3"
+    assert execute == f"EXECUTE {name} (%(a)s, %(b)s, %(limit)s)"
+
+
+def test_prepared_statement_reuses_position_for_repeated_param():
+    name, prepare, execute = _prepared_statement(
+        "SELECT * FROM t WHERE (%(city)s IS NULL OR c = %(city)s) AND n > %(n)s"
+    )
+
+    assert prepare == f"PREPARE {name} AS SELECT * FROM t WHERE ($1 IS NULL OR c = $1) AND n > $2"
+    assert execute == f"EXECUTE {name} (%(city)s, %(n)s)"
+
+
+def test_prepared_statement_without_params_executes_without_args():
+    name, prepare, execute = _prepared_statement("SELECT 1")
+
+    assert prepare == f"PREPARE {name} AS SELECT 1"
+    assert execute == f"EXECUTE {name}"
+
+
+def test_prepared_statement_unescapes_percent_in_body():
+    name, prepare, execute = _prepared_statement(
+        "SELECT * FROM t WHERE a LIKE 'x%%' AND b = %(b)s"
+    )
+
+    assert prepare == f"PREPARE {name} AS SELECT * FROM t WHERE a LIKE 'x%' AND b = $1"
+    assert execute == f"EXECUTE {name} (%(b)s)"
+
+
+def test_prepared_statement_name_is_stable_per_query_text():
+    assert _prepared_statement("SELECT 1")[0] == _prepared_statement("SELECT 1")[0]
+    assert _prepared_statement("SELECT 1")[0] != _prepared_statement("SELECT 2")[0]
+
+
+def test_getconn_opens_connection_with_current_token(connect):
+    conn_pool = make_pool()
+
+    conn_pool.getconn()
+
+    assert connect[0]["password"] == "tok"
+
+
+def test_token_is_fetched_outside_the_pool_lock(connect):
+    conn_pool = None
+    locked = []
+
+    def token_provider():
+        if conn_pool is not None:
+            locked.append(conn_pool._lock.locked())
+        return "tok"
+
+    conn_pool = _TokenAuthPool(0, 1, token_provider=token_provider, timeout=0.05)
+    conn_pool.getconn()
+
+    assert locked == [False]
+
+
+def test_getconn_times_out_when_pool_is_exhausted(connect):
+    conn_pool = make_pool(maxconn=1)
+    conn_pool.getconn()
+
+    with pytest.raises(_PoolTimeout):
+        conn_pool.getconn()
+
+
+def test_putconn_releases_slot(connect):
+    conn_pool = make_pool(maxconn=1)
+    conn_pool.putconn(conn_pool.getconn())
+
+    assert conn_pool.getconn() is not None
+
+
+def test_failed_getconn_releases_slot(monkeypatch):
+    def refuse(*args, **kwargs):
+        raise OperationalError("connection refused")
+
+    monkeypatch.setattr(pool.psycopg2, "connect", refuse)
+    conn_pool = make_pool(maxconn=1)
+
+    # Both attempts reach the connect call instead of timing out on the slot
+    for _ in range(2):
+        with pytest.raises(OperationalError):
+            conn_pool.getconn()
+
+
+def test_retire_keeps_checked_out_connections_open(connect):
+    conn_pool = make_pool(maxconn=2)
+    idle, in_use = conn_pool.getconn(), conn_pool.getconn()
+    conn_pool.minconn = 2  # Keep the returned connection idle in the pool
+    conn_pool.putconn(idle)
+
+    conn_pool.retire()
+
+    assert idle.closed
+    assert not in_use.closed
+    conn_pool.putconn(in_use)
+    assert in_use.closed
+    with pytest.raises(pool.PoolError, match="closed"):
+        conn_pool.getconn()
+
+
+def test_checkout_rebuilds_pool_with_new_token_after_connect_failure(monkeypatch, service):
+    refuse_first_connect(monkeypatch)
+
+    conn_pool, conn = service._checkout()
+
+    assert conn_pool is lakebase_service._connection_pool
+    assert not conn.closed
+    assert lakebase_service._token_cache["token"] is None
+
+
+def test_failed_build_leaves_pool_built_by_another_thread(monkeypatch, service):
+    other = _TokenAuthPool(1, 1, token_provider=lambda: "fresh", timeout=0.05)
+
+    def other_thread_builds_pool():
+        lakebase_service._connection_pool = other
+
+    refuse_first_connect(monkeypatch, before_raise=other_thread_builds_pool)
+
+    conn_pool, _ = service._checkout()
+
+    assert conn_pool is other
+    assert not other.closed
+    assert lakebase_service._token_cache["token"] == "tok"
+
+
+def test_checkout_retries_pool_closed_under_the_caller(monkeypatch, service):
+    stale = service._get_connection_pool()
+    fetched = []
+
+    def reset_by_another_thread():
+        fetched.append(stale)
+        if len(fetched) == 1:
+            service._reset_pool(stale)
+            return stale
+        return lakebase_service.LakebaseService._get_connection_pool(service)
+
+    monkeypatch.setattr(service, "_get_connection_pool", reset_by_another_thread)
+
+    conn_pool, _ = service._checkout()
+
+    assert stale.closed
+    assert conn_pool is not stale
+    assert not conn_pool.closed
+
+
+def test_checkout_timeout_raises_connection_error(service):
+    service._checkout()
+
+    with pytest.raises(DatabaseConnectionError):
+        service._checkout()
@@ -90,7 +90,7 @@ if [ "$PROD_MODE" = true ]; then
   echo "✅ Frontend built successfully"
   
   # In production mode, only start backend (frontend served by FastAPI)
-  uv run uvicorn server.app:app --reload --reload-dir server --host 0.0.0.0 --port 8000 &
+  uv run uvicorn server.app:app --loop uvloop --http httptools --reload --reload-dir server --host 0.0.0.0 --port 8000 &
   BACKEND_PID=$!
   echo "Backend PID: $BACKEND_PID"
   
@@ -103,7 +103,7 @@ else
   echo "Frontend PID: $FRONTEND_PID"
 
   echo "🖥️ Starting backend development server..."
-  uv run uvicorn server.app:app --reload --reload-dir server --host 0.0.0.0 --port 8000 &
+  uv run uvicorn server.app:app --loop uvloop --http httptools --reload --reload-dir server --host 0.0.0.0 --port 8000 &
   BACKEND_PID=$!
   echo "Backend PID: $BACKEND_PID"
 fi